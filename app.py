@@ -3,25 +3,22 @@ import streamlit as st
 import os
 from dotenv import load_dotenv
 import logging
+import math
 import time
-from groq import Groq
-import docx
-import PyPDF2
-import pptx
+import hashlib
+import threading
+from collections import OrderedDict
+import asyncio
+from groq import Groq, AsyncGroq
 from pathlib import Path
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime
 import json
 import yaml
 import io
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-import markdown
-from PIL import Image
-import pdfkit
-import imgkit
+import posixpath
+import zipfile
+# pandas, numba, the document parsers, PDF/image renderers and plotly are imported
+# where they are used, so pages that never touch them don't pay for them on a cold start
 
 # Configure page settings for better UI
 st.set_page_config(
@@ -85,22 +82,244 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize Groq client
-load_dotenv()
-client = Groq(api_key=os.getenv('GROQ_API_KEY'))
+# Initialize Groq client once per process so reruns share its connection pool
+@st.cache_resource
+def get_groq():
+    load_dotenv()
+    return Groq(api_key=os.getenv('GROQ_API_KEY'))
+
+class CompletionCache:
+    """Bounded, expiring store of finished completions shared by every session."""
+
+    def __init__(self, max_entries=128, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(prompt, model, temperature, max_tokens):
+        # Hash the prompt so document-sized prompts don't become dictionary keys
+        digest = hashlib.sha256(prompt.encode()).hexdigest()
+        return (digest, model, temperature, max_tokens)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, text = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return text
+
+    def put(self, key, text):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+@st.cache_resource
+def get_completion_cache():
+    return CompletionCache()
+
+def _groq_complete_stream(prompt: str, model: str = "mixtral-8x7b-32768",
+                          temperature: float = 0.3, max_tokens: int = 1500):
+    # Yield tokens as they arrive; a prompt answered within the last hour is replayed whole
+    cache = get_completion_cache()
+    key = cache.key(prompt, model, temperature, max_tokens)
+    cached = cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+    
+    stream = get_groq().chat.completions.create(
+        messages=[{"role": "user", "content": prompt}],
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stream=True
+    )
+    tokens = []
+    for chunk in stream:
+        token = chunk.choices[0].delta.content or ""
+        tokens.append(token)
+        yield token
+    cache.put(key, "".join(tokens))
+
+# Upper bound on concurrent Groq requests per batch; unbounded fan-out trips rate
+# limits and makes every request in the batch time out together
+GROQ_MAX_INFLIGHT = 5
+# Retries (with backoff) the SDK makes on rate limits, timeouts and 5xx before giving up
+GROQ_MAX_RETRIES = 3
+
+async def _acomplete(aclient, semaphore, prompt, model="mixtral-8x7b-32768",
+                     temperature=0.3, max_tokens=1500):
+    cache = get_completion_cache()
+    key = cache.key(prompt, model, temperature, max_tokens)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    
+    async with semaphore:
+        response = await aclient.chat.completions.create(
+            messages=[{"role": "user", "content": prompt}],
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+    text = response.choices[0].message.content
+    cache.put(key, text)
+    return text
+
+async def _acomplete_all(prompts, **kwargs):
+    # A fresh async client and semaphore per batch, since each asyncio.run() owns
+    # its own event loop and asyncio primitives can't be shared between loops.
+    # Each prompt's outcome is returned in order: its text, or the exception that
+    # survived the SDK's retries, so one failure doesn't discard the whole batch
+    semaphore = asyncio.Semaphore(GROQ_MAX_INFLIGHT)
+    async with AsyncGroq(api_key=get_groq().api_key, max_retries=GROQ_MAX_RETRIES) as aclient:
+        return await asyncio.gather(
+            *(_acomplete(aclient, semaphore, prompt, **kwargs) for prompt in prompts),
+            return_exceptions=True
+        )
+
+# Prompt skeletons, formatted with str.format_map so identical inputs always
+# produce byte-identical prompts (and therefore identical completion cache keys)
+_INSIGHTS_TMPL = """Analyze the following business metrics for a {business_type} business and provide strategic insights:
+
+Metrics:
+- Revenue Growth: {revenue_growth:.2f}%
+- Profit Margin: {profit_margin:.2f}%
+- Customer Acquisition Cost: ${customer_acquisition_cost:.2f}
+- Customer Lifetime Value: ${customer_lifetime_value:.2f}
+- ROI: {roi:.2f}%
+
+Please provide:
+1. Key insights and trends
+2. Specific recommendations for improvement
+3. Potential risks and opportunities
+4. Strategic action items
+"""
+
+_DOCUMENT_TMPL = """Process the following document content based on {process_type}:
+
+{text_content}
+
+Provide a detailed {process_type} focusing on the main points and key takeaways."""
+
+_COMPETITOR_TMPL = """Analyze the competitive landscape for a {market_position} in the {industry} industry.
+
+Competitors:
+{competitors}
+
+Please provide:
+1. Detailed competitor analysis
+2. Market positioning strategy
+3. Competitive advantages and disadvantages
+4. Recommendations for market positioning
+"""
+
+_MARKET_TRENDS_TMPL = """Analyze market trends for the {industry} industry over a {timeframe} period.
+
+Focus Areas:
+{focus_areas}
+
+Please provide:
+1. Current market trends
+2. Future projections
+3. Impact analysis
+4. Strategic recommendations
+"""
+
+_SWOT_TMPL = """Perform a SWOT analysis for a company in the {industry} industry.
+
+Strengths:
+{strengths}
+
+Weaknesses:
+{weaknesses}
+
+Opportunities:
+{opportunities}
+
+Threats:
+{threats}
+
+Please provide:
+1. Detailed SWOT analysis
+2. Strategic implications
+3. Recommended actions
+"""
+
+_RISK_TMPL = """Assess risks for a company in the {industry} industry.
+
+Risk Factors:
+{risk_factors}
+
+Please provide:
+1. Risk analysis for each factor
+2. Risk mitigation strategies
+3. Monitoring recommendations
+4. Contingency planning
+"""
+
+_CONTRACT_TMPL = """Generate a professional {contract_type} contract with the following requirements:
+{requirements}
+
+Please include all standard legal sections including:
+1. Parties involved
+2. Terms and conditions
+3. Payment terms (if applicable)
+4. Duration
+5. Termination clauses
+6. Governing law
+7. Signature blocks
+
+Format in proper legal contract style with clear sections and numbering."""
+
+_CHUNK_SUMMARY_TMPL = """Summarize part {part} of {total} of a longer document.
+Keep every main point, key figure and action item; they will be combined with the other parts.
+
+{chunk}"""
+
+# Batches smaller than this use plain pandas arithmetic; the JIT kernel's compile
+# and thread start-up costs only pay off on large uploads
+NUMBA_MIN_ROWS = 10000
 
 class BusinessAnalyzer:
+    @staticmethod
+    def analyze_business_metrics_batch(df):
+        import pandas as pd
+        
+        # Column-wise arithmetic over every row at once; zero denominators give inf/NaN
+        if len(df) >= NUMBA_MIN_ROWS:
+            from metrics_kernel import compute_metrics
+            return pd.DataFrame(compute_metrics(df), index=df.index)
+        
+        return pd.DataFrame({
+            "revenue_growth": ((df["current_revenue"] - df["previous_revenue"]) / df["previous_revenue"]) * 100,
+            "profit_margin": (df["net_profit"] / df["current_revenue"]) * 100,
+            "customer_acquisition_cost": df["marketing_spend"] / df["new_customers"],
+            "customer_lifetime_value": df["average_order_value"] * df["purchase_frequency"] * df["customer_lifespan"],
+            "roi": ((df["net_profit"] - df["total_investment"]) / df["total_investment"]) * 100
+        }, index=df.index)
+
     @staticmethod
     def analyze_business_metrics(data):
+        import pandas as pd
+        
         try:
-            # Analyze key business metrics
-            metrics = {
-                "revenue_growth": ((data["current_revenue"] - data["previous_revenue"]) / data["previous_revenue"]) * 100,
-                "profit_margin": (data["net_profit"] / data["current_revenue"]) * 100,
-                "customer_acquisition_cost": data["marketing_spend"] / data["new_customers"],
-                "customer_lifetime_value": data["average_order_value"] * data["purchase_frequency"] * data["customer_lifespan"],
-                "roi": ((data["net_profit"] - data["total_investment"]) / data["total_investment"]) * 100
-            }
+            # Analyze key business metrics as a one-row batch
+            metrics = BusinessAnalyzer.analyze_business_metrics_batch(
+                pd.DataFrame([data])
+            ).iloc[0].to_dict()
+            # Keep rejecting zero denominators rather than reporting inf/NaN metrics
+            if not all(math.isfinite(value) for value in metrics.values()):
+                raise ZeroDivisionError("division by zero")
             return metrics
         except Exception as e:
             st.error(f"Error analyzing metrics: {str(e)}")
@@ -108,45 +327,81 @@ class BusinessAnalyzer:
 
     @staticmethod
     def generate_business_insights(metrics, business_type):
-        prompt = f"""
-        Analyze the following business metrics for a {business_type} business and provide strategic insights:
+        prompt = _INSIGHTS_TMPL.format_map({**metrics, "business_type": business_type})
         
-        Metrics:
-        - Revenue Growth: {metrics['revenue_growth']:.2f}%
-        - Profit Margin: {metrics['profit_margin']:.2f}%
-        - Customer Acquisition Cost: ${metrics['customer_acquisition_cost']:.2f}
-        - Customer Lifetime Value: ${metrics['customer_lifetime_value']:.2f}
-        - ROI: {metrics['roi']:.2f}%
-        
-        Please provide:
-        1. Key insights and trends
-        2. Specific recommendations for improvement
-        3. Potential risks and opportunities
-        4. Strategic action items
-        """
-        
-        response = client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="mixtral-8x7b-32768",
-            temperature=0.3,
-            max_tokens=1500
-        )
-        return response.choices[0].message.content
+        return _groq_complete_stream(prompt)
+
+WORDML_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+PACKAGE_RELS_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+def _docx_main_part(archive, parser):
+    from lxml import etree
+    
+    # The main document part is named by the package relationships, not a fixed path
+    with archive.open('_rels/.rels') as rels:
+        root = etree.parse(rels, parser).getroot()
+    for rel in root.iter(f'{PACKAGE_RELS_NS}Relationship'):
+        if rel.get('Type', '').endswith('/officeDocument'):
+            return posixpath.normpath(rel.get('Target')).lstrip('/')
+    raise ValueError("No main document part found in the .docx package")
+
+def _docx_paragraph_text(paragraph):
+    # Tabs and line breaks inside runs become \t and \n, as python-docx rendered them
+    parts = []
+    for node in paragraph.iter(f'{WORDML_NS}t', f'{WORDML_NS}tab', f'{WORDML_NS}br',
+                               f'{WORDML_NS}cr'):
+        if node.tag == f'{WORDML_NS}t':
+            parts.append(node.text or '')
+        elif node.getparent().tag != f'{WORDML_NS}r':
+            continue  # tab stop definitions in paragraph properties, not content
+        elif node.tag == f'{WORDML_NS}tab':
+            parts.append('\t')
+        elif node.get(f'{WORDML_NS}type') not in ('page', 'column'):
+            parts.append('\n')
+    return ''.join(parts)
+
+def _extract_docx_text(raw):
+    from lxml import etree
+    
+    # Uploaded XML is untrusted: never expand entities or fetch external resources
+    hardened = dict(resolve_entities=False, no_network=True)
+    
+    # Stream paragraphs out of the main document part instead of building
+    # python-docx's object graph
+    paragraphs = []
+    with zipfile.ZipFile(io.BytesIO(raw)) as archive:
+        main_part = _docx_main_part(archive, etree.XMLParser(**hardened))
+        with archive.open(main_part) as xml:
+            for _, elem in etree.iterparse(xml, events=('end',), tag=f'{WORDML_NS}p',
+                                           **hardened):
+                paragraphs.append(_docx_paragraph_text(elem))
+                # Drop the finished paragraph and everything before it so the
+                # partially built tree doesn't grow with the document
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+    return '\n'.join(paragraphs)
 
 def process_uploaded_file(uploaded_file):
-    file_extension = Path(uploaded_file.name).suffix.lower()
-    
+    # Read the upload once; parsers then seek around a RAM buffer, not Streamlit's handle
+    raw = uploaded_file.getvalue()
+    return _extract(raw, Path(uploaded_file.name).suffix.lower())
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _extract(raw, file_extension):
+    # Keyed on the file bytes, so widget reruns on the same upload skip re-parsing
     try:
         if file_extension == '.txt':
-            return uploaded_file.getvalue().decode()
+            return raw.decode()
         elif file_extension == '.docx':
-            doc = docx.Document(uploaded_file)
-            return '\n'.join([paragraph.text for paragraph in doc.paragraphs])
+            return _extract_docx_text(raw)
         elif file_extension == '.pdf':
-            pdf_reader = PyPDF2.PdfReader(uploaded_file)
-            return '\n'.join([page.extract_text() for page in pdf_reader.pages])
+            import pymupdf
+            with pymupdf.open(stream=raw, filetype="pdf") as doc:
+                return '\n'.join(page.get_text() for page in doc)
         elif file_extension == '.pptx':
-            prs = pptx.Presentation(uploaded_file)
+            import pptx
+            prs = pptx.Presentation(io.BytesIO(raw))
             text = []
             for slide in prs.slides:
                 for shape in slide.shapes:
@@ -158,54 +413,147 @@ def process_uploaded_file(uploaded_file):
     except Exception as e:
         raise Exception(f"Error processing file: {str(e)}")
 
+# Documents longer than this are condensed chunk by chunk before the final request
+MAX_DIRECT_DOCUMENT_CHARS = 24000
+DOCUMENT_CHUNK_CHARS = 3000
+CHUNK_SUMMARY_MAX_TOKENS = 300
+MAX_CONDENSE_PASSES = 3
+
+def _split_text(text, chunk_size=DOCUMENT_CHUNK_CHARS, separators=("\n\n", "\n", ". ")):
+    # Split on the coarsest separator that keeps pieces under chunk_size, recursing
+    # into finer separators (and finally a hard cut) for pieces that are still too long
+    if len(text) <= chunk_size:
+        return [text]
+    if not separators:
+        return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+    
+    separator, finer = separators[0], separators[1:]
+    chunks, current = [], ""
+    for piece in text.split(separator):
+        if len(piece) > chunk_size:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.extend(_split_text(piece, chunk_size, finer))
+        elif current and len(current) + len(separator) + len(piece) > chunk_size:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}{separator}{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _condense_document(text_content):
+    # Map-reduce: summarize all chunks concurrently, repeating until the joined
+    # summaries fit in a single prompt or MAX_CONDENSE_PASSES runs out
+    for _ in range(MAX_CONDENSE_PASSES):
+        if len(text_content) <= MAX_DIRECT_DOCUMENT_CHARS:
+            break
+        chunks = _split_text(text_content)
+        prompts = [
+            _CHUNK_SUMMARY_TMPL.format_map({"part": part, "total": len(chunks), "chunk": chunk})
+            for part, chunk in enumerate(chunks, start=1)
+        ]
+        results = asyncio.run(_acomplete_all(prompts, max_tokens=CHUNK_SUMMARY_MAX_TOKENS))
+        failures = [result for result in results if isinstance(result, Exception)]
+        if failures:
+            # Raising keeps st.cache_data from storing a partial summary; the parts that
+            # succeeded stay in the completion cache, so a retry only resends the failed ones
+            raise Exception(
+                f"{len(failures)} of {len(results)} parts could not be summarized: {failures[0]}"
+            ) from failures[0]
+        text_content = "\n\n".join(results)
+    # Summaries that stopped shrinking are cut to fit instead of condensed forever
+    return text_content[:MAX_DIRECT_DOCUMENT_CHARS]
+
 def process_document(text_content, process_type):
+    # A generator, so failures raised while the response streams are wrapped too
     try:
-        prompt = f"""Process the following document content based on {process_type}:
+        if len(text_content) > MAX_DIRECT_DOCUMENT_CHARS:
+            text_content = _condense_document(text_content)
         
-        {text_content}
+        prompt = _DOCUMENT_TMPL.format_map({
+            "process_type": process_type, "text_content": text_content
+        })
         
-        Provide a detailed {process_type} focusing on the main points and key takeaways."""
-        
-        response = client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="mixtral-8x7b-32768",
-            temperature=0.3,
-            max_tokens=1500
-        )
-        
-        return response.choices[0].message.content
+        yield from _groq_complete_stream(prompt)
     except Exception as e:
         raise Exception(f"Error processing document: {str(e)}")
 
 def main():
+    # Only the selected page runs; the URL route keeps the selection across reruns.
+    # The default page is served at the root; the others get short explicit routes
+    # instead of ones derived from the function names
+    analytics_page = st.Page(display_business_analytics, title="Business Analytics", default=True)
+    documents_page = st.Page(display_document_processing, title="Document Processing",
+                             url_path="documents")
+    pages = [
+        analytics_page,
+        documents_page,
+        st.Page(display_contract_generation, title="Contract Generator", url_path="contracts"),
+        st.Page(display_market_analysis, title="Market Analysis", url_path="market"),
+    ]
+    selected_page = st.navigation(pages)
+    
     # Sidebar navigation
     with st.sidebar:
         st.image("https://via.placeholder.com/150x150.png?text=BI+Suite", width=150)
         st.title("Business Suite")
-        selected_page = st.radio(
-            "Navigate to:",
-            ["Business Analytics", "Document Processing", "Contract Generator", 
-             "Market Analysis"]
-        )
         
         # User profile section in sidebar
         st.sidebar.markdown("---")
         st.sidebar.title("Profile")
-        if st.sidebar.button("📋 Dashboard"):
-            selected_page = "Business Analytics"
-        if st.sidebar.button("📄 Documents"):
-            selected_page = "Document Processing"
+        st.page_link(analytics_page, label="Dashboard", icon="📋")
+        st.page_link(documents_page, label="Documents", icon="📄")
         st.sidebar.markdown("---")
 
-    if selected_page == "Business Analytics":
-        display_business_analytics()
-    elif selected_page == "Document Processing":
-        display_document_processing()
-    elif selected_page == "Contract Generator":
-        display_contract_generation()
-    elif selected_page == "Market Analysis":
-        display_market_analysis()
+    selected_page.run()
 
+@st.cache_resource(show_spinner=False)
+def _build_gauge(profit_margin):
+    # Keyed on the metric value, so unchanged inputs reuse the built figure. A
+    # resource rather than data cache: st.plotly_chart leaves the figure untouched, and
+    # unpickling a fresh copy on every hit costs more than building the gauge anew
+    import plotly.graph_objects as go
+    
+    fig = go.Figure()
+    fig.add_trace(go.Indicator(
+        mode="gauge+number",
+        value=profit_margin,
+        title={'text': "Profit Margin"},
+        gauge={'axis': {'range': [0, 100]},
+               'bar': {'color': "#336699"}}
+    ))
+    # Let Plotly.js keep the existing trace on rerun instead of redrawing from scratch
+    fig.update_layout(uirevision='constant')
+    return fig
+
+@st.cache_data(show_spinner=False)
+def _build_metrics_chart(metrics):
+    import pandas as pd
+    import plotly.express as px
+    
+    # One long-format frame, faceted by unit so dollar values don't flatten the percentages
+    df = pd.DataFrame({
+        "metric": ["Revenue Growth", "Profit Margin", "ROI",
+                   "Customer Acquisition Cost", "Customer Lifetime Value"],
+        "value": [metrics["revenue_growth"], metrics["profit_margin"], metrics["roi"],
+                  metrics["customer_acquisition_cost"], metrics["customer_lifetime_value"]],
+        "unit": ["Percent (%)"] * 3 + ["Dollars ($)"] * 2
+    })
+    fig = px.bar(df, x="metric", y="value", facet_col="unit", text_auto=".2f",
+                 color_discrete_sequence=["#336699"])
+    # Give each facet its own axes and strip the "unit=" prefix from the facet titles
+    fig.update_xaxes(matches=None, title=None)
+    fig.update_yaxes(matches=None, showticklabels=True, title=None)
+    fig.for_each_annotation(lambda a: a.update(text=a.text.split("=", 1)[-1]))
+    fig.update_layout(uirevision='constant')
+    return fig
+
+# Each page is a fragment: widget interactions rerun only that page, not main()
+@st.fragment
 def display_business_analytics():
     st.title("Business Analytics Dashboard")
     
@@ -278,25 +626,18 @@ def display_business_analytics():
                 """.format(metrics["roi"]), unsafe_allow_html=True)
 
             # Generate and display insights
-            insights = BusinessAnalyzer.generate_business_insights(metrics, business_type)
             st.subheader("Business Insights")
-            st.markdown(f"""
-            <div class="card">
-                {insights}
-            </div>
-            """, unsafe_allow_html=True)
+            # Streamed markdown can't be placed inside the HTML card, so use a bordered container
+            with st.container(border=True):
+                st.write_stream(
+                    BusinessAnalyzer.generate_business_insights(metrics, business_type)
+                )
             
             # Create visualizations
-            fig = go.Figure()
-            fig.add_trace(go.Indicator(
-                mode="gauge+number",
-                value=metrics["profit_margin"],
-                title={'text': "Profit Margin"},
-                gauge={'axis': {'range': [0, 100]},
-                       'bar': {'color': "#336699"}}
-            ))
-            st.plotly_chart(fig)
+            st.plotly_chart(_build_metrics_chart(metrics), width="stretch")
+            st.plotly_chart(_build_gauge(metrics["profit_margin"]))
 
+@st.fragment
 def display_document_processing():
     st.title("Smart Document Processing")
     
@@ -326,22 +667,22 @@ def display_document_processing():
             )
             
             if st.button("Process Document"):
+                st.markdown("""
+                <div class="card">
+                    <h3>Analysis Results</h3>
+                </div>
+                """, unsafe_allow_html=True)
                 with st.spinner("Processing document..."):
-                    summary = process_document(text_content, process_type)
-                    st.markdown(f"""
-                    <div class="card">
-                        <h3>Analysis Results</h3>
-                        {summary}
-                    </div>
-                    """, unsafe_allow_html=True)
+                    st.write_stream(process_document(text_content, process_type))
         except Exception as e:
             st.error(str(e))
 
+@st.fragment
 def display_contract_generation():
     st.title("AI Contract Generator")
     
     # Initialize contract generator
-    contract_gen = ContractGenerator(client)
+    contract_gen = ContractGenerator()
     
     # Contract configuration
     st.markdown("""
@@ -386,19 +727,18 @@ def display_contract_generation():
                 # Join requirements into a single string
                 requirements_text = "\n".join(filter(None, requirements))
                 
-                # Generate contract content
-                contract_content = contract_gen.generate_contract_template(
-                    contract_type, requirements_text
-                )
-                
-                # Display contract preview
+                # Display contract preview while the content streams in
                 st.markdown("""
                 <div class="card">
                     <h3>Contract Preview</h3>
                 </div>
                 """, unsafe_allow_html=True)
                 
-                st.markdown(contract_content)
+                contract_content = st.write_stream(
+                    contract_gen.generate_contract_template(
+                        contract_type, requirements_text
+                    )
+                )
                 
                 # Add download options
                 col1, col2 = st.columns(2)
@@ -424,6 +764,7 @@ def display_contract_generation():
             except Exception as e:
                 st.error(f"Error generating contract: {str(e)}")
 
+@st.fragment
 def display_market_analysis():
     st.title("Market Analysis & Trends")
     
@@ -436,7 +777,8 @@ def display_market_analysis():
     
     analysis_type = st.selectbox(
         "Select Analysis Type",
-        ["Competitor Analysis", "Market Trends", "SWOT Analysis", "Risk Assessment"]
+        ["Competitor Analysis", "Market Trends", "SWOT Analysis", "Risk Assessment",
+         "Full Analysis"]
     )
     
     industry = st.selectbox(
@@ -444,237 +786,175 @@ def display_market_analysis():
         ["Technology", "Healthcare", "Finance", "Retail", "Manufacturing", "Other"]
     )
     
+    # Full Analysis collects every form below and runs them as one batch
+    full_analysis = analysis_type == "Full Analysis"
+    prompts = {}
+    
     # Dynamic form based on analysis type
-    if analysis_type == "Competitor Analysis":
+    if full_analysis or analysis_type == "Competitor Analysis":
         competitors = st.text_area("List main competitors (one per line)")
         market_position = st.selectbox(
             "Your Market Position",
             ["Market Leader", "Strong Competitor", "Growing Player", "New Entrant"]
         )
+        prompts["Competitor Analysis"] = build_competitor_prompt(
+            competitors, market_position, industry
+        )
         
-        if st.button("Generate Competitor Analysis"):
+        if not full_analysis and st.button("Generate Competitor Analysis"):
             with st.spinner("Analyzing competitors..."):
-                analysis = generate_competitor_analysis(competitors, market_position, industry)
+                analysis = generate_competitor_analysis(
+                    competitors, market_position, industry
+                )
                 display_analysis_results(analysis)
                 
-    elif analysis_type == "Market Trends":
+    if full_analysis or analysis_type == "Market Trends":
         timeframe = st.selectbox("Timeframe", ["Short-term", "Medium-term", "Long-term"])
         focus_areas = st.multiselect(
             "Focus Areas",
             ["Consumer Behavior", "Technology Trends", "Economic Factors", 
              "Regulatory Changes", "Market Size", "Growth Potential"]
         )
+        prompts["Market Trends"] = build_market_trends_prompt(industry, timeframe, focus_areas)
         
-        if st.button("Analyze Market Trends"):
+        if not full_analysis and st.button("Analyze Market Trends"):
             with st.spinner("Analyzing market trends..."):
                 trends = generate_market_trends(industry, timeframe, focus_areas)
                 display_analysis_results(trends)
                 
-    elif analysis_type == "SWOT Analysis":
+    if full_analysis or analysis_type == "SWOT Analysis":
         strengths = st.text_area("List your strengths")
         weaknesses = st.text_area("List your weaknesses")
         opportunities = st.text_area("List market opportunities")
         threats = st.text_area("List potential threats")
+        prompts["SWOT Analysis"] = build_swot_prompt(
+            strengths, weaknesses, opportunities, threats, industry
+        )
         
-        if st.button("Generate SWOT Analysis"):
+        if not full_analysis and st.button("Generate SWOT Analysis"):
             with st.spinner("Generating SWOT analysis..."):
                 swot = generate_swot_analysis(
                     strengths, weaknesses, opportunities, threats, industry
                 )
                 display_analysis_results(swot)
                 
-    elif analysis_type == "Risk Assessment":
+    if full_analysis or analysis_type == "Risk Assessment":
         risk_factors = st.multiselect(
             "Risk Factors to Analyze",
             ["Market Risk", "Financial Risk", "Operational Risk", 
              "Strategic Risk", "Compliance Risk"]
         )
+        prompts["Risk Assessment"] = build_risk_prompt(risk_factors, industry)
         
-        if st.button("Generate Risk Assessment"):
+        if not full_analysis and st.button("Generate Risk Assessment"):
             with st.spinner("Assessing risks..."):
                 risks = generate_risk_assessment(risk_factors, industry)
                 display_analysis_results(risks)
+    
+    if full_analysis and st.button("Generate Full Analysis"):
+        with st.spinner("Running full market analysis..."):
+            # Fire all sub-analyses concurrently instead of one blocking call each
+            results = asyncio.run(_acomplete_all(list(prompts.values())))
+        for title, result in zip(prompts, results):
+            st.subheader(title)
+            if isinstance(result, Exception):
+                st.error(f"Error generating {title}: {str(result)}")
+                continue
+            display_analysis_results(
+                result, file_name=f"{title.lower().replace(' ', '_')}.md"
+            )
+
+def build_competitor_prompt(competitors, market_position, industry):
+    return _COMPETITOR_TMPL.format_map({
+        "competitors": competitors, "market_position": market_position, "industry": industry
+    })
+
+def build_market_trends_prompt(industry, timeframe, focus_areas):
+    return _MARKET_TRENDS_TMPL.format_map({
+        "industry": industry, "timeframe": timeframe, "focus_areas": ', '.join(focus_areas)
+    })
+
+def build_swot_prompt(strengths, weaknesses, opportunities, threats, industry):
+    return _SWOT_TMPL.format_map({
+        "strengths": strengths, "weaknesses": weaknesses,
+        "opportunities": opportunities, "threats": threats, "industry": industry
+    })
+
+def build_risk_prompt(risk_factors, industry):
+    return _RISK_TMPL.format_map({
+        "risk_factors": ', '.join(risk_factors), "industry": industry
+    })
 
 def generate_competitor_analysis(competitors, market_position, industry):
-    prompt = f"""Analyze the competitive landscape for a {market_position} in the {industry} industry.
-    
-    Competitors:
-    {competitors}
-    
-    Please provide:
-    1. Detailed competitor analysis
-    2. Market positioning strategy
-    3. Competitive advantages and disadvantages
-    4. Recommendations for market positioning
-    """
-    
-    response = client.chat.completions.create(
-        messages=[{"role": "user", "content": prompt}],
-        model="mixtral-8x7b-32768",
-        temperature=0.3,
-        max_tokens=1500
-    )
-    return response.choices[0].message.content
+    return _groq_complete_stream(build_competitor_prompt(competitors, market_position, industry))
 
 def generate_market_trends(industry, timeframe, focus_areas):
-    prompt = f"""Analyze market trends for the {industry} industry over a {timeframe} period.
-    
-    Focus Areas:
-    {', '.join(focus_areas)}
-    
-    Please provide:
-    1. Current market trends
-    2. Future projections
-    3. Impact analysis
-    4. Strategic recommendations
-    """
-    
-    response = client.chat.completions.create(
-        messages=[{"role": "user", "content": prompt}],
-        model="mixtral-8x7b-32768",
-        temperature=0.3,
-        max_tokens=1500
-    )
-    return response.choices[0].message.content
+    return _groq_complete_stream(build_market_trends_prompt(industry, timeframe, focus_areas))
 
 def generate_swot_analysis(strengths, weaknesses, opportunities, threats, industry):
-    prompt = f"""Perform a SWOT analysis for a company in the {industry} industry.
-    
-    Strengths:
-    {strengths}
-    
-    Weaknesses:
-    {weaknesses}
-    
-    Opportunities:
-    {opportunities}
-    
-    Threats:
-    {threats}
-    
-    Please provide:
-    1. Detailed SWOT analysis
-    2. Strategic implications
-    3. Recommended actions
-    """
-    
-    response = client.chat.completions.create(
-        messages=[{"role": "user", "content": prompt}],
-        model="mixtral-8x7b-32768",
-        temperature=0.3,
-        max_tokens=1500
+    return _groq_complete_stream(
+        build_swot_prompt(strengths, weaknesses, opportunities, threats, industry)
     )
-    return response.choices[0].message.content
 
 def generate_risk_assessment(risk_factors, industry):
-    prompt = f"""Assess risks for a company in the {industry} industry.
-    
-    Risk Factors:
-    {', '.join(risk_factors)}
-    
-    Please provide:
-    1. Risk analysis for each factor
-    2. Risk mitigation strategies
-    3. Monitoring recommendations
-    4. Contingency planning
-    """
-    
-    response = client.chat.completions.create(
-        messages=[{"role": "user", "content": prompt}],
-        model="mixtral-8x7b-32768",
-        temperature=0.3,
-        max_tokens=1500
-    )
-    return response.choices[0].message.content
+    return _groq_complete_stream(build_risk_prompt(risk_factors, industry))
 
-def display_analysis_results(analysis):
+def display_analysis_results(analysis, file_name="market_analysis.md"):
     st.markdown("""
     <div class="card">
         <h3>Analysis Results</h3>
     </div>
     """, unsafe_allow_html=True)
     
-    st.markdown(analysis)
+    # Streamed results are rendered as they arrive and collected for download
+    if isinstance(analysis, str):
+        st.markdown(analysis)
+    else:
+        analysis = st.write_stream(analysis)
     
     # Download options
     st.download_button(
         "Download Analysis",
         analysis,
-        file_name="market_analysis.md",
+        file_name=file_name,
         mime="text/markdown"
     )
 
 class ContractGenerator:
-    def __init__(self, client):
-        self.client = client
-
     def generate_contract_template(self, contract_type, requirements):
-        prompt = f"""Generate a professional {contract_type} contract with the following requirements:
-        {requirements}
-        
-        Please include all standard legal sections including:
-        1. Parties involved
-        2. Terms and conditions
-        3. Payment terms (if applicable)
-        4. Duration
-        5. Termination clauses
-        6. Governing law
-        7. Signature blocks
-        
-        Format in proper legal contract style with clear sections and numbering."""
+        prompt = _CONTRACT_TMPL.format_map({
+            "contract_type": contract_type, "requirements": requirements
+        })
 
-        response = self.client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="mixtral-8x7b-32768",
-            temperature=0.3,
-            max_tokens=2000
-        )
-        return response.choices[0].message.content
+        return _groq_complete_stream(prompt, max_tokens=2000)
 
     def create_pdf(self, content):
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+        from reportlab.platypus import SimpleDocTemplate, Paragraph
+        from xml.sax.saxutils import escape
+        
         try:
             # Create a buffer for the PDF
             buffer = io.BytesIO()
+            doc = SimpleDocTemplate(
+                buffer, pagesize=letter,
+                leftMargin=50, rightMargin=50, topMargin=50, bottomMargin=50
+            )
             
-            # Create the PDF object
-            pdf = canvas.Canvas(buffer, pagesize=letter)
-            width, height = letter
-            
-            # Set font and size
-            pdf.setFont("Helvetica", 12)
-            
-            # Split content into lines
-            y = height - 50  # Start from top with margin
-            lines = content.split('\n')
+            # Helvetica 12pt on 20pt lines, matching the previous hand-drawn layout
+            style = ParagraphStyle(
+                "Contract", parent=getSampleStyleSheet()["BodyText"],
+                fontName="Helvetica", fontSize=12, leading=20, spaceBefore=0
+            )
             
-            for line in lines:
-                # Wrap text to fit page width
-                words = line.split()
-                current_line = []
-                
-                for word in words:
-                    current_line.append(word)
-                    # Check if current line width exceeds page width
-                    if pdf.stringWidth(' '.join(current_line)) > width - 100:
-                        current_line.pop()
-                        # Draw the line
-                        pdf.drawString(50, y, ' '.join(current_line))
-                        y -= 20  # Move down for next line
-                        current_line = [word]
-                        
-                        # Check if we need a new page
-                        if y < 50:
-                            pdf.showPage()
-                            y = height - 50
-                            pdf.setFont("Helvetica", 12)
-                
-                # Draw remaining words in the line
-                if current_line:
-                    pdf.drawString(50, y, ' '.join(current_line))
-                    y -= 20
+            # One paragraph per source line; reportlab handles wrapping and page breaks
+            story = [
+                Paragraph(escape(line), style)
+                for line in content.split('\n') if line.strip()
+            ]
             
-            pdf.save()
-            buffer.seek(0)
+            doc.build(story)
             return buffer.getvalue()
             
         except Exception as e:
@@ -682,17 +962,44 @@ class ContractGenerator:
             return None
 
     def create_image(self, content):
+        import pymupdf
+        import markdown
+        from PIL import Image
+        
         try:
             # Convert markdown to HTML first
             html_content = markdown.markdown(content)
             
-            # Create image using imgkit with error handling
-            options = {
-                'quiet': '',
-                'encoding': 'UTF-8'
-            }
-            img = imgkit.from_string(html_content, False, options=options)
-            return img
+            # Lay the HTML out on letter pages in-process with PyMuPDF's HTML engine
+            story = pymupdf.Story(html=html_content)
+            mediabox = pymupdf.paper_rect("letter")
+            where = mediabox + (36, 36, -36, -36)
+            pdf_buffer = io.BytesIO()
+            writer = pymupdf.DocumentWriter(pdf_buffer)
+            more = True
+            while more:
+                device = writer.begin_page(mediabox)
+                more, _ = story.place(where)
+                story.draw(device)
+                writer.end_page()
+            writer.close()
+            
+            # Rasterize the pages and stack them into a single image
+            with pymupdf.open(stream=pdf_buffer.getvalue(), filetype="pdf") as doc:
+                pages = []
+                for page in doc:
+                    pix = page.get_pixmap()
+                    pages.append(Image.frombytes("RGB", (pix.width, pix.height), pix.samples))
+            
+            img = Image.new("RGB", (pages[0].width, sum(page.height for page in pages)), "white")
+            y = 0
+            for page in pages:
+                img.paste(page, (0, y))
+                y += page.height
+            
+            output = io.BytesIO()
+            img.save(output, format="PNG")
+            return output.getvalue()
         except Exception as e:
             st.error(f"Error creating image: {str(e)}")
             return None
@@ -0,0 +1,41 @@
+# metrics_kernel.py
+# Numba kernel for large batches of business metrics. It lives in its own module so
+# the dispatcher is built once per process (Streamlit re-executes app.py on every
+# rerun) and so numba is only imported when a batch is big enough to need it.
+import numpy as np
+from numba import njit, prange
+
+# Input columns of the metrics kernel, in argument order
+METRIC_INPUTS = [
+    "current_revenue", "previous_revenue", "net_profit", "marketing_spend", "new_customers",
+    "average_order_value", "purchase_frequency", "customer_lifespan", "total_investment"
+]
+
+METRIC_OUTPUTS = [
+    "revenue_growth", "profit_margin", "customer_acquisition_cost",
+    "customer_lifetime_value", "roi"
+]
+
+# fastmath without nnan/ninf and the numpy error model, so zero denominators
+# still come out as inf/NaN instead of being optimized away or raising
+@njit(parallel=True, cache=True, error_model="numpy",
+      fastmath={"nsz", "arcp", "contract", "afn", "reassoc"})
+def _metrics_kernel(cr, pr, np_, ms, nc, aov, pf, cl, ti):
+    n = cr.shape[0]
+    revenue_growth = np.empty(n)
+    profit_margin = np.empty(n)
+    customer_acquisition_cost = np.empty(n)
+    customer_lifetime_value = np.empty(n)
+    roi = np.empty(n)
+    for i in prange(n):
+        revenue_growth[i] = ((cr[i] - pr[i]) / pr[i]) * 100
+        profit_margin[i] = (np_[i] / cr[i]) * 100
+        customer_acquisition_cost[i] = ms[i] / nc[i]
+        customer_lifetime_value[i] = aov[i] * pf[i] * cl[i]
+        roi[i] = ((np_[i] - ti[i]) / ti[i]) * 100
+    return revenue_growth, profit_margin, customer_acquisition_cost, customer_lifetime_value, roi
+
+def compute_metrics(df):
+    # Hand the kernel contiguous float64 arrays; zero denominators give inf/NaN
+    columns = [df[name].to_numpy(dtype=np.float64) for name in METRIC_INPUTS]
+    return dict(zip(METRIC_OUTPUTS, _metrics_kernel(*columns)))